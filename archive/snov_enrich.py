@@ -111,19 +111,26 @@ def pick_best_email(domain_payload: Dict[str, Any], limit_per_domain: int = 5) -
     return [t[3] for t in scored[:max(1, int(limit_per_domain))]]
 
 
-def enrich_with_snov(df: pd.DataFrame, session: requests.Session, limit_per_domain: int) -> pd.DataFrame:
+def enrich_with_snov(df: pd.DataFrame, session: requests.Session, limit_per_domain: int,
+                     rows: pd.Index | None = None) -> pd.DataFrame:
+    """Enrich df in place; only the `rows` index labels (default: all) are looked up."""
     new_rows = 0
-    for idx, row in df.iterrows():
+    payloads: Dict[str, Any] = {}  # one lookup per domain per run, however many rows share it
+    target = df if rows is None else df.loc[rows]
+    for idx, row in target.iterrows():
         dom = str(row.get("final_domain") or row.get("domain") or "").strip()
         if not dom:
             continue
         cache_path = CACHE_DIR / f"{dom}.json"
+        from_cache = dom in payloads or cache_path.exists()
         try:
-            payload = cached_json(cache_path, lambda: session.get(DOMAIN_URL, params={
-                "domain": dom,
-                "type": "all",
-                "limit": limit_per_domain
-            }, timeout=25).json())
+            if dom not in payloads:
+                payloads[dom] = cached_json(cache_path, lambda: session.get(DOMAIN_URL, params={
+                    "domain": dom,
+                    "type": "all",
+                    "limit": limit_per_domain
+                }, timeout=25).json())
+            payload = payloads[dom]
             best = pick_best_email(payload, limit_per_domain=limit_per_domain)
             if not best:
                 continue
@@ -144,7 +151,9 @@ def enrich_with_snov(df: pd.DataFrame, session: requests.Session, limit_per_doma
             print(f"[HTTP] {dom}: {ex}")
         except Exception as ex:
             print(f"[ERR] {dom}: {ex}")
-        time.sleep(0.25)
+        # throttle only real API calls; cache hits need no politeness delay
+        if not from_cache:
+            time.sleep(0.25)
     print(f"[snov] wrote {new_rows} new emails from Snov")
     return df
 
@@ -244,7 +253,8 @@ def main():
         return
 
     with snov_session() as sess:
-        df = enrich_with_snov(df, sess, args.limit_per_domain)
+        # only spend credits on the rows that passed the filters above
+        df = enrich_with_snov(df, sess, args.limit_per_domain, rows=work.index)
         if args.verify:
             df = verify_new_emails(df, sess)
 
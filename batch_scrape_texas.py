@@ -1,10 +1,18 @@
 # batch_scrape_texas.py
 import os
+import json
 import time
+import random
+import hashlib
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 from sqlalchemy import create_engine
 from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import re
 
 
@@ -26,13 +34,13 @@ _NEGATIVE_RX = re.compile(
     re.I,
 )
 
-def passes_product_fit(row) -> bool:
+def passes_product_fit(company_name, reason="") -> bool:
     """
     Inspect both the company name and the Apify 'reason'/description field.
     Returns True when we detect ready‑mix or volumetric language and no
     blacklist terms.
     """
-    blob = f"{row['company_name']} {row.get('reason', '')}"
+    blob = f"{company_name} {reason}"
     return bool(_READY_MIX_RX.search(blob)) and not _NEGATIVE_RX.search(blob)
 # --------------------------------------------------------
 
@@ -43,8 +51,48 @@ if not TOKEN:
 if not MAPS_ACTOR_ID:
     raise SystemExit("Set APIFY_MAPS_ACTOR_ID in .env to the actor ID from Apify console (looks like Z1m8HE2JfTNU9ZBfx)")
 
-def start_run(city):
-    body = {
+# Completed city datasets are cached so reruns within the TTL skip the actor entirely.
+# Set APIFY_CACHE_TTL_HOURS=0 to always re-scrape.
+CACHE_DIR = Path("data/cache/apify")
+CACHE_TTL_SECONDS = float(os.getenv("APIFY_CACHE_TTL_HOURS", 24)) * 3600
+
+# How many city runs to have in flight at once.
+MAX_CONCURRENT_RUNS = int(os.getenv("APIFY_MAX_CONCURRENT_RUNS", 3))
+
+# Status polls long-poll on the server (waitForFinish) so completion is seen as soon as it
+# happens. Polls that come back early, and network errors, back off 1s → 2s → 4s … up to
+# POLL_MAX_DELAY; errors are retried until a run has been waited on for
+# APIFY_MAX_WAIT_MINUTES in total.
+WAIT_FOR_FINISH_SECS = 60  # Apify's maximum
+POLL_MAX_DELAY = 30
+MAX_WAIT_SECONDS = float(os.getenv("APIFY_MAX_WAIT_MINUTES", 60)) * 60
+
+# Dataset items are downloaded in pages of this many rows, keeping only the fields
+# main() uses (items otherwise carry reviews, opening hours and other nested data).
+DATASET_PAGE_SIZE = 1000
+DATASET_FIELDS = ("title", "businessName", "website")
+
+# One pooled session for every Apify call, so polls and downloads reuse the TLS
+# connection to api.apify.com instead of handshaking per request. Transient 429/5xx
+# answers are retried with backoff (honouring Retry-After); POST is left out of the
+# status retries so a flaky response can't start the same actor run twice.
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "concrete-genius/1.0"})
+_retry = Retry(
+    total=5,
+    backoff_factor=1.0,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+_adapter = HTTPAdapter(
+    pool_connections=4, pool_maxsize=max(4, MAX_CONCURRENT_RUNS * 2), max_retries=_retry
+)
+SESSION.mount("https://", _adapter)
+
+def run_input(city):
+    return {
         "memory": 1024,
         "searchStringsArray": [f"ready mix concrete {city} TX"],
         "locationQuery": f"{city}, TX",
@@ -53,10 +101,13 @@ def start_run(city):
         "scrapePlaceDetailPage": True,
         "skipClosedPlaces": True
     }
+
+def start_run(city):
+    body = run_input(city)
     url = f"https://api.apify.com/v2/acts/{MAPS_ACTOR_ID}/runs?token={TOKEN}"
     # print("DEBUG URL:", url)
     # print("DEBUG body:", body)
-    r = requests.post(url, json=body, timeout=60)
+    r = SESSION.post(url, data=orjson.dumps(body), headers={"Content-Type": "application/json"}, timeout=60)
     if r.status_code >= 400:
         print("---- START_RUN ERROR ----", r.status_code, r.text)
     r.raise_for_status()
@@ -69,10 +120,23 @@ CITIES = [
 
 engine = create_engine("sqlite:///leads.db")
 
+def warm_up_session():
+    """Open the pooled TLS connection to Apify before the first real request."""
+    # best-effort, so retries are switched off for this one request: with the session's
+    # Retry policy an unreachable Apify would stall startup for most of a minute.
+    # Runs before the city threads start, so swapping the adapter setting is safe.
+    retry, _adapter.max_retries = _adapter.max_retries, Retry(0, read=False)
+    try:
+        SESSION.head("https://api.apify.com/v2", timeout=3)
+    except requests.RequestException:
+        pass
+    finally:
+        _adapter.max_retries = retry
+
 def print_log(run_id: str, lines: int = 25):
     """Fetch and print first N lines of run log for debugging failures."""
     try:
-        resp = requests.get(f"https://api.apify.com/v2/logs/{run_id}?token={TOKEN}", timeout=30)
+        resp = SESSION.get(f"https://api.apify.com/v2/logs/{run_id}?token={TOKEN}", timeout=30)
         if resp.ok:
             snippet = "\n".join(resp.text.splitlines()[:lines])
             print("---- RUN LOG ----")
@@ -80,43 +144,118 @@ def print_log(run_id: str, lines: int = 25):
     except Exception as e:
         print(f"Could not fetch log for {run_id}: {e}")
 
+def iter_dataset_items(dataset_id: str, page_size: int = DATASET_PAGE_SIZE):
+    """Yield dataset items (DATASET_FIELDS only) page by page until a short page."""
+    offset = 0
+    fields = ",".join(DATASET_FIELDS)
+    while True:
+        url = (f"https://api.apify.com/v2/datasets/{dataset_id}/items"
+               f"?format=jsonl&fields={fields}&limit={page_size}&offset={offset}&token={TOKEN}")
+        with SESSION.get(url, stream=True, timeout=60) as r:
+            r.raise_for_status()
+            count = 0
+            for line in r.iter_lines():
+                if line:
+                    count += 1
+                    item = orjson.loads(line)
+                    yield {k: item[k] for k in DATASET_FIELDS if k in item}
+        if count < page_size:
+            return
+        offset += page_size
+
 def wait_for_dataset(run_id: str) -> pd.DataFrame:
     """Poll run until finished; return DataFrame or empty on failure."""
+    started = time.monotonic()
+    delay = 1.0
+    last_status = None
     while True:
-        run = requests.get(
-            f"https://api.apify.com/v2/actor-runs/{run_id}?token={TOKEN}",
-            timeout=30
-        )
+        polled = time.monotonic()
+        try:
+            run = SESSION.get(
+                f"https://api.apify.com/v2/actor-runs/{run_id}"
+                f"?waitForFinish={WAIT_FOR_FINISH_SECS}&token={TOKEN}",
+                timeout=WAIT_FOR_FINISH_SECS + 30
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if time.monotonic() - started > MAX_WAIT_SECONDS:
+                print(f"Run {run_id}: giving up after repeated errors -> {e}")
+                return pd.DataFrame()
+            time.sleep(delay + random.uniform(0, 0.25 * delay))
+            delay = min(delay * 2, POLL_MAX_DELAY)
+            continue
         run.raise_for_status()
         data = run.json()["data"]
         status = data["status"]
+        if status != last_status:
+            # new phase (e.g. READY → RUNNING): poll quickly again before backing off
+            last_status = status
+            delay = 1.0
         if status == "SUCCEEDED":
-            ds = data["defaultDatasetId"]
-            csv_url = f"https://api.apify.com/v2/datasets/{ds}/items?format=csv&token={TOKEN}"
-            return pd.read_csv(csv_url)
+            return pd.DataFrame(list(iter_dataset_items(data["defaultDatasetId"])))
         if status in ("FAILED", "ABORTED", "TIMED-OUT"):
             print(f"Run {run_id} ended with {status}")
             print_log(run_id)
             return pd.DataFrame()
-        time.sleep(8)
+        # the server already held the request open while the run kept going; only
+        # back off if it answered early without the run finishing
+        if time.monotonic() - polled < WAIT_FOR_FINISH_SECS / 2:
+            time.sleep(delay + random.uniform(0, 0.25 * delay))
+            delay = min(delay * 2, POLL_MAX_DELAY)
+
+def _cache_path(city) -> Path:
+    # key on actor + full run input so changing any search parameter misses the cache
+    key = json.dumps({"actor": MAPS_ACTOR_ID, "input": run_input(city)}, sort_keys=True)
+    return CACHE_DIR / f"{hashlib.sha256(key.encode()).hexdigest()}.csv"
+
+def load_cached_dataset(city):
+    """Return the cached DataFrame for this city's run input, or None if missing/stale."""
+    path = _cache_path(city)
+    try:
+        if time.time() - path.stat().st_mtime > CACHE_TTL_SECONDS:
+            return None
+        return pd.read_csv(path)
+    except Exception:
+        return None
+
+def save_cached_dataset(city, df: pd.DataFrame):
+    if CACHE_TTL_SECONDS <= 0:
+        return
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        df.to_csv(_cache_path(city), index=False)
+    except Exception as e:
+        print(f"{city}: could not cache dataset -> {e}")
+
+def scrape_city(city) -> pd.DataFrame:
+    """Return the city's dataset (cached or freshly scraped); empty on failure."""
+    df = load_cached_dataset(city)
+    if df is not None:
+        print(f"{city}: using cached dataset ({len(df)} rows)")
+        return df
+    print(f"Starting scrape: {city}")
+    try:
+        run_id = start_run(city)
+    except Exception as e:
+        print(f"{city}: failed to start run -> {e}")
+        return pd.DataFrame()
+    df = wait_for_dataset(run_id)
+    if not df.empty:
+        save_cached_dataset(city, df)
+    return df
 
 def main():
     frames = []
-    for city in CITIES:
-        print(f"Starting scrape: {city}")
-        try:
-            run_id = start_run(city)
-        except Exception as e:
-            print(f"{city}: failed to start run -> {e}")
-            continue
-
-        df = wait_for_dataset(run_id)
-        if df.empty:
-            print(f"{city}: no data")
-            continue
-        df["source_city"] = city
-        frames.append(df)
-        print(f"{city}: {len(df)} rows scraped.")
+    warm_up_session()
+    # Actor runs are independent and spend most of their time server-side, so run
+    # several at once (bounded by the account's concurrent-run/memory allowance).
+    with ThreadPoolExecutor(max_workers=max(1, MAX_CONCURRENT_RUNS)) as ex:
+        for city, df in zip(CITIES, ex.map(scrape_city, CITIES)):
+            if df.empty:
+                print(f"{city}: no data")
+                continue
+            df["source_city"] = city
+            frames.append(df)
+            print(f"{city}: {len(df)} rows scraped.")
 
     if not frames:
         raise SystemExit("No data scraped. Exiting.")
@@ -131,7 +270,12 @@ def main():
     df_all = df_all[df_all["url"].notna() & df_all["url"].str.strip().ne("")]
     df_all = df_all.drop_duplicates("url")
     # flag rows that appear to sell ready‑mix or volumetric concrete
-    df_all["product_fit"] = df_all.apply(passes_product_fit, axis=1)
+    # zip over plain column arrays rather than df.apply(axis=1), which builds a Series per row
+    reasons = df_all["reason"] if "reason" in df_all.columns else [""] * len(df_all)
+    df_all["product_fit"] = [
+        passes_product_fit(name, reason)
+        for name, reason in zip(df_all["company_name"].to_numpy(dtype=object), reasons)
+    ]
     df_all["scraped_at"] = datetime.utcnow()
 
     # ---- ensure the DB schema has the new product_fit column ----
@@ -125,29 +125,33 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
             df["final_domain"] = df["domain"].astype(str)
         else:
             # derive from website if possible
-            df["final_domain"] = df["website"].apply(domain_from_url)
+            df["final_domain"] = domains_from_urls(df["website"])
     # strip whitespace
     for c in ("email","phone","website","final_domain"):
         if c in df.columns:
             df[c] = df[c].astype(str).str.strip()
     return df
 
+URL_NETLOC_RX = r"^(?:[A-Za-z][A-Za-z0-9+.\-]*:)?//([^/?#]*)"
+
+def domains_from_urls(urls: pd.Series) -> pd.Series:
+    """Vectorized domain_from_url: netloc, lowercased, leading www. removed ('' if none)."""
+    # urlparse ignores leading whitespace, and the regex is anchored, so strip first
+    netloc = urls.astype(str).str.strip().str.extract(URL_NETLOC_RX, expand=False).fillna("")
+    return netloc.str.lower().str.replace(r"^www\.", "", regex=True)
+
 def drop_blocked_domains(df, allow_facebook):
-    def domain_allowed(email, website, final_domain):
-        # If both empty, drop
-        if (not email) and (not website) and (not final_domain):
-            return False
-        # check email domain
-        if email:
-            d = domain_from_email(email)
-            if is_blocked_domain(d, allow_facebook):
-                return False
-        # check final_domain first, then website
-        d2 = (final_domain or domain_from_url(website) or "").lower()
-        if d2 and is_blocked_domain(d2, allow_facebook):
-            return False
-        return True
-    return df[df.apply(lambda r: domain_allowed(r.get("email",""), r.get("website",""), r.get("final_domain","")), axis=1)]
+    # Column-wise version of the per-row check: drop rows with no email/website/domain at all,
+    # or whose email domain or site domain (final_domain, else website) is blocked
+    blocked = BLOCKED_DOMAINS - FACEBOOK_DOMAINS if allow_facebook else BLOCKED_DOMAINS
+    email = df["email"].astype(str)
+    website = df["website"].astype(str)
+    final_domain = df["final_domain"].astype(str)
+    all_empty = (email == "") & (website == "") & (final_domain == "")
+    email_blocked = (email != "") & email.str.rsplit("@", n=1).str[-1].str.lower().isin(blocked)
+    site_domain = final_domain.where(final_domain != "", domains_from_urls(website)).str.lower()
+    site_blocked = site_domain.isin(blocked)
+    return df[~(all_empty | email_blocked | site_blocked)]
 
 def require_contact_method(df):
     # Require at least one contact method: email or phone (non-empty)
@@ -162,9 +166,34 @@ def classify_contact(row):
         return "named_email" if not is_role_email(e) else "role_email"
     return "phone_only" if p else "none"
 
+POSITIVE_RX = re.compile("|".join(re.escape(k) for k in KEYWORDS_POSITIVE))
+FIT_BLOB_COLUMNS = ["company_name","url","website","final_domain","domain","source_url"]
+
+def explicit_product_fit(value):
+    # infer_product_fit's explicit part: only real bools and yes/no strings count; anything
+    # else (ints such as SQLite 0/1, NaN, None) is None and falls through to the heuristic
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        v = value.strip().lower()
+        if v in {"true","yes","1"}:
+            return True
+        if v in {"false","no","0"}:
+            return False
+    return None
+
 def filter_product_fit(df):
-    mask = df.apply(infer_product_fit, axis=1)
-    return df[mask]
+    # Vectorized equivalent of infer_product_fit: explicit product_fit wins, else keyword heuristic
+    if "product_fit" in df.columns:
+        explicit = df["product_fit"].map(explicit_product_fit)
+    else:
+        explicit = pd.Series(None, index=df.index, dtype=object)
+    is_true = explicit.eq(True)
+    is_false = explicit.eq(False)
+    cols = [df[c].astype(str) if c in df.columns else pd.Series("", index=df.index) for c in FIT_BLOB_COLUMNS]
+    blob = cols[0].str.cat(cols[1:], sep=" ").str.lower()
+    heuristic = blob.str.contains(POSITIVE_RX, na=False)
+    return df[is_true | (~is_false & heuristic)]
 
 def select_contacts(df, keep_roles: bool, max_per_domain: int, email_only: bool):
     df = df.copy()
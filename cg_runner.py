@@ -13,16 +13,18 @@ import sys
 import time
 import random
 import argparse
-from dataclasses import dataclass, asdict
+from html import unescape as html_unescape
+from dataclasses import dataclass
 from typing import List, Dict, Set, Optional, Tuple
 from urllib.parse import urlparse, urljoin, unquote
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import httpx
-from selectolax.parser import HTMLParser
 import tldextract
 import phonenumbers
 
+from scrape_common import HTMLParser, MAX_PAGE_BYTES
+
 # Optional: MX presence check via dnspython
 try:
     import dns.resolver
@@ -50,6 +52,24 @@ RESUME_DEFAULT = True
 INPUT_CSV = "prospects_raw.csv"
 OUTPUT_CSV = "Merged_Final_Leads_Master.csv"
 
+# Offline public-suffix lookup: use tldextract's bundled snapshot instead of fetching
+# (and caching) the live list on first use.
+TLD_EXTRACT = tldextract.TLDExtract(suffix_list_urls=())
+
+# Shared client so page fetches reuse pooled keep-alive connections instead of
+# paying a fresh TCP+TLS handshake per request (httpx.Client is thread-safe).
+# With more fetch threads (site x page concurrency) than pooled connections, extra
+# threads wait for a free connection rather than timing out and dropping the page.
+HTTP_CLIENT = httpx.Client(
+    follow_redirects=True,
+    timeout=httpx.Timeout(REQUEST_TIMEOUT, pool=None),
+    headers={"User-Agent": USER_AGENT},
+    transport=httpx.HTTPTransport(
+        retries=2,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+    ),
+)
+
 # ---------------------- Utils ----------------------
 
 def normalize_url(u: str) -> str:
@@ -60,19 +80,24 @@ def normalize_url(u: str) -> str:
         u = "https://" + u
     return u
 
+def canonical_url(u: str) -> str:
+    """Scheme-, www- and trailing-slash-insensitive key for spotting duplicate prospects."""
+    p = urlparse(normalize_url(u).lower())
+    key = p.netloc.removeprefix("www.") + p.path.rstrip("/")
+    return f"{key}?{p.query}" if p.query else key
+
 def final_url_and_domain(start_url: str) -> Tuple[str, str]:
     url = normalize_url(start_url)
     try:
-        with httpx.Client(follow_redirects=True, timeout=REQUEST_TIMEOUT, headers={"User-Agent": USER_AGENT}) as client:
-            r = client.get(url)
-            final = str(r.url)
-            extracted = tldextract.extract(final)
-            domain = ".".join(p for p in [extracted.domain, extracted.suffix] if p)
-            return final, domain
+        r = HTTP_CLIENT.get(url)
+        final = str(r.url)
+        extracted = TLD_EXTRACT(final)
+        domain = ".".join(p for p in [extracted.domain, extracted.suffix] if p)
+        return final, domain
     except Exception:
         # Fall back to parsing
         parsed = urlparse(url)
-        extracted = tldextract.extract(parsed.netloc or "")
+        extracted = TLD_EXTRACT(parsed.netloc or "")
         domain = ".".join(p for p in [extracted.domain, extracted.suffix] if p)
         return url, domain
 
@@ -88,18 +113,32 @@ EMAIL_OBF = [
 
 PHONE_RAW = re.compile(r'\+?\d[\d\-\.\s\(\)]{7,}')
 
+# Cheap substring gates: only build a DOM when the page can contain what we look for.
+# Character references are everywhere (&#8217;, &#038;, &#x27;), so only unescape when the
+# plain check fails and the page has some, to catch entity-encoded mailto: hrefs.
+def has_mailto(html: str) -> bool:
+    if "mailto:" in html:
+        return True
+    return "&#" in html and "mailto:" in html_unescape(html)
+
+def has_jsonld(html: str) -> bool:
+    return "ld+json" in html
+
 def deobfuscate(text: str) -> str:
     s = unquote(text).replace('&#64;', '@').replace('\\u0040', '@')
     for pat, repl in EMAIL_OBF:
         s = pat.sub(repl, s)
     return s
 
-def extract_emails(html: str) -> Set[str]:
+def extract_emails(html: str, doc: Optional[HTMLParser] = None) -> Set[str]:
     text = deobfuscate(html)
     emails = set(EMAIL_RAW.findall(text))
     # mailto:
+    if not has_mailto(html):
+        return {e.lower() for e in emails}
     try:
-        doc = HTMLParser(html)
+        if doc is None:
+            doc = HTMLParser(html)
         for a in doc.css('a[href^="mailto:"]'):
             href = a.attributes.get('href', '')
             e = deobfuscate(href)[7:]
@@ -110,7 +149,7 @@ def extract_emails(html: str) -> Set[str]:
         pass
     return {e.lower() for e in emails}
 
-def extract_phones(html: str, region: str = REGION_DEFAULT) -> Set[str]:
+def extract_phones(html: str, region: str = REGION_DEFAULT, doc: Optional[HTMLParser] = None) -> Set[str]:
     phones = set()
     for raw in PHONE_RAW.findall(html):
         try:
@@ -120,8 +159,11 @@ def extract_phones(html: str, region: str = REGION_DEFAULT) -> Set[str]:
         except Exception:
             pass
     # JSON-LD
+    if not has_jsonld(html):
+        return phones
     try:
-        doc = HTMLParser(html)
+        if doc is None:
+            doc = HTMLParser(html)
         for node in doc.css('script[type="application/ld+json"]'):
             try:
                 data = json.loads(node.text())
@@ -143,13 +185,19 @@ def extract_phones(html: str, region: str = REGION_DEFAULT) -> Set[str]:
 
 def fetch(url: str) -> Optional[str]:
     try:
-        with httpx.Client(follow_redirects=True, timeout=REQUEST_TIMEOUT, headers={"User-Agent": USER_AGENT}) as client:
-            r = client.get(url)
-            if r.status_code < 400 and "text/html" in r.headers.get("content-type", ""):
-                return r.text
+        # stream so non-HTML responses are dropped after the headers and huge pages
+        # are cut off at MAX_PAGE_BYTES instead of being buffered whole
+        with HTTP_CLIENT.stream("GET", url) as r:
+            if r.status_code >= 400 or "text/html" not in r.headers.get("content-type", ""):
+                return None
+            body = bytearray()
+            for chunk in r.iter_bytes():
+                body += chunk
+                if len(body) >= MAX_PAGE_BYTES:
+                    break
+            return body[:MAX_PAGE_BYTES].decode(r.encoding or "utf-8", errors="replace")
     except Exception:
         return None
-    return None
 
 def fetch_many(urls: List[str], concurrency: int) -> Dict[str, Optional[str]]:
     results: Dict[str, Optional[str]] = {u: None for u in urls}
@@ -230,8 +278,10 @@ def scrape_site(company: str, start_url: str, page_concurrency: int = DEFAULT_PA
     for p, html in page_html_map.items():
         if not html:
             continue
-        emails = extract_emails(html)
-        phones = extract_phones(html)
+        # parse once (and only if needed) and share the tree between both extractors
+        doc = HTMLParser(html) if has_mailto(html) or has_jsonld(html) else None
+        emails = extract_emails(html, doc=doc)
+        phones = extract_phones(html, doc=doc)
         for e in emails:
             if e not in collected_emails:
                 collected_emails[e] = p
@@ -281,6 +331,22 @@ def scrape_site(company: str, start_url: str, page_concurrency: int = DEFAULT_PA
         ))
     return rows
 
+def iter_prospects(path: str):
+    """Yield (company_name, url) for every row with a url, reading only those two columns."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header or "url" not in header:
+            return
+        url_idx = header.index("url")
+        company_idx = header.index("company_name") if "company_name" in header else None
+        for row in reader:
+            url = row[url_idx].strip() if url_idx < len(row) else ""
+            if not url:
+                continue
+            company = row[company_idx].strip() if company_idx is not None and company_idx < len(row) else ""
+            yield company, url
+
 def run(
     input_csv: str = INPUT_CSV,
     output_csv: str = OUTPUT_CSV,
@@ -296,24 +362,14 @@ def run(
     resume: bool = RESUME_DEFAULT,
 ):
     # Read prospects
-    prospects: List[Tuple[str, str]] = []
-    with open(input_csv, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            company = (row.get("company_name") or "").strip()
-            url = (row.get("url") or "").strip()
-            if not url:
-                continue
-            prospects.append((company, url))
+    prospects: List[Tuple[str, str]] = list(iter_prospects(input_csv))
 
     # Resume logic: filter out already processed (company_name, url) pairs
+    # (rows without a url can never match a prospect, so skipping them is fine)
     processed_keys = set()
     if resume:
         try:
-            with open(output_csv, newline='', encoding='utf-8') as f:
-                rd = csv.DictReader(f)
-                for row in rd:
-                    processed_keys.add((row.get('company_name','').strip(), row.get('url','').strip()))
+            processed_keys = set(iter_prospects(output_csv))
         except FileNotFoundError:
             pass
 
@@ -325,6 +381,20 @@ def run(
     if processed_keys:
         prospects = [(c,u) for (c,u) in prospects if (c,u) not in processed_keys]
 
+    # Scraped lists repeat sites as http/https, www/bare or with a trailing slash;
+    # crawl each site once (first occurrence wins). Seed with what earlier runs already
+    # wrote so the dedupe also holds across resumes.
+    seen_urls: Set[str] = {canonical_url(u) for _, u in processed_keys}
+    unique: List[Tuple[str, str]] = []
+    for c, u in prospects:
+        key = canonical_url(u)
+        if key not in seen_urls:
+            seen_urls.add(key)
+            unique.append((c, u))
+    if len(unique) < len(prospects):
+        print(f"Skipping {len(prospects) - len(unique)} duplicate prospect URLs")
+    prospects = unique
+
     out_fieldnames = ["company_name","url","domain","email_final","email_source","verification_status",
                       "phone","source_url","reason","qualified","product_fit","score"]
 
@@ -333,12 +403,12 @@ def run(
         # If not appending or file doesn't exist, we need header
         write_header = not header_written
         try:
-            with open(output_csv, mode, newline='', encoding='utf-8') as f:
-                w = csv.DictWriter(f, fieldnames=out_fieldnames)
+            # one large buffer and a plain writer over attribute tuples (no per-row dict)
+            with open(output_csv, mode, newline='', encoding='utf-8', buffering=1 << 20) as f:
+                w = csv.writer(f)
                 if write_header:
-                    w.writeheader()
-                for r in rows:
-                    w.writerow(asdict(r))
+                    w.writerow(out_fieldnames)
+                w.writerows(tuple(getattr(r, k) for k in out_fieldnames) for r in rows)
             return True
         except Exception:
             return False
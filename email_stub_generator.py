@@ -29,9 +29,14 @@ Env:
 import os
 import re
 import csv
+import json
+import time
+import hashlib
+import pathlib
 import textwrap
 import argparse
 from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 from dotenv import load_dotenv
@@ -55,6 +60,20 @@ FREEMAIL = ("gmail.com","yahoo.com","aol.com","hotmail.com","outlook.com","proto
 DEFAULT_IN  = "data/outputs/Scored_Leads_Rescored.csv"
 DEFAULT_OUT = "data/outputs/Smartlead_Import.csv"
 
+MODEL = "gpt-4o-mini"
+
+# model outputs cached per sha256(model + prompt) so reruns don't pay twice
+CACHE_DIR = pathlib.Path("data/cache/stubs")
+CACHE_TTL_SECONDS = 30 * 86400
+
+# long scraped reasons/signals only inflate tokens; the prompt needs a short gist
+MAX_CONTEXT_CHARS = 600
+
+# parallel model calls; keep under the account's RPM limit
+DEFAULT_CONCURRENCY = int(os.getenv("STUB_CONCURRENCY", 8))
+RATE_LIMIT_RETRIES = 4
+FLUSH_EVERY = 25
+
 TEMPLATE = textwrap.dedent("""
 Write a concise cold email in 110-120 words to {first_name} at {company_name}.
 Context: {context}
@@ -102,7 +121,7 @@ def split_name_from_email(e: str) -> Dict[str, str]:
     return {"first_name": first_name, "last_name": last_name}
 
 
-def infer_pain_point(row: pd.Series) -> str:
+def infer_pain_point(row: Dict[str, Any]) -> str:
     signals = str(row.get("signals", "")).lower()
     svc = str(row.get("service_keywords", "")).lower()
     reason = str(row.get("reason", "")).lower()
@@ -121,7 +140,7 @@ def infer_pain_point(row: pd.Series) -> str:
     return ", ".join(ctx)
 
 
-def build_context(row: pd.Series) -> str:
+def build_context(row: Dict[str, Any]) -> str:
     parts = []
     bt = str(row.get("business_type","")) or ""
     if bt:
@@ -135,26 +154,61 @@ def build_context(row: pd.Series) -> str:
     reason = str(row.get("reason",""))
     if reason:
         parts.append(f"reason: {reason}")
-    return "; ".join(parts) or "ready-mix operations and batching/dispatch context"
+    context = "; ".join(parts) or "ready-mix operations and batching/dispatch context"
+    return context[:MAX_CONTEXT_CHARS]
 
 
-def model_email(first_name: str, company_name: str, context: str, pain_point: str) -> str:
+def _cache_get(key: str):
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        if time.time() - path.stat().st_mtime > CACHE_TTL_SECONDS:
+            return None
+        return json.loads(path.read_text())["text"]
+    except Exception:
+        return None
+
+
+def _cache_set(key: str, text: str) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        (CACHE_DIR / f"{key}.json").write_text(json.dumps({"model": MODEL, "text": text}))
+    except Exception:
+        pass
+
+
+def require_openai() -> None:
     if not OPENAI_API_KEY:
         raise SystemExit("OPENAI_API_KEY not set")
     if openai is None:
         raise SystemExit("openai package not installed in this environment")
 
+def model_email(first_name: str, company_name: str, context: str, pain_point: str) -> str:
+    require_openai()
+
     openai.api_key = OPENAI_API_KEY
     prompt = TEMPLATE.format(first_name=first_name or "there", company_name=company_name, context=context, pain_point=pain_point)
-    try:
-        rsp = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=220,
-            temperature=0.5,
-        )
-        text = (rsp.choices[0].message.content or "").strip()
-    except Exception as ex:
+    key = hashlib.sha256((MODEL + prompt).encode("utf-8")).hexdigest()
+    text = _cache_get(key) or ""
+    for attempt in range(0 if text else RATE_LIMIT_RETRIES):
+        try:
+            rsp = openai.chat.completions.create(
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=220,
+                temperature=0.5,
+            )
+            text = (rsp.choices[0].message.content or "").strip()
+            if text:
+                _cache_set(key, text)
+            break
+        except openai.RateLimitError:
+            # back off and retry instead of silently falling back under concurrency
+            # (no point sleeping after the last attempt)
+            if attempt < RATE_LIMIT_RETRIES - 1:
+                time.sleep(2 ** attempt)
+        except Exception:
+            break
+    if not text:
         text = f"Hi {first_name or 'there'}, quick idea to improve ready-mix ops at {company_name}. We help plants keep mixes consistent, reduce waste, and give dispatch live visibility without adding headcount. If this is relevant, open to a 15-minute call to compare notes?"
     # hard cap ~120 words
     words = text.split()
@@ -164,7 +218,7 @@ def model_email(first_name: str, company_name: str, context: str, pain_point: st
 
 # ----------------- main -----------------
 
-def run(src: str, dst: str, allow_role: bool = False) -> None:
+def run(src: str, dst: str, allow_role: bool = False, concurrency: int = DEFAULT_CONCURRENCY) -> None:
     df = pd.read_csv(src)
 
     # normalize columns used downstream
@@ -199,7 +253,9 @@ def run(src: str, dst: str, allow_role: bool = False) -> None:
         raise SystemExit("No eligible rows after filtering (need product_fit=True, tier A/B, valid non-role email). Try --allow-role.")
 
     rows = []
-    for _, r in work.iterrows():
+    prompts = []
+    # plain dict records avoid building a Series per row
+    for _, r in zip(work.index, work.to_dict("records")):
         company = str(r.get("company_name")) or domain.loc[_] or str(r.get("url") or r.get("website") or "").split("//")[-1]
         email = str(r.get("email_final"))
         first = str(r.get("first_name",""))
@@ -212,7 +268,7 @@ def run(src: str, dst: str, allow_role: bool = False) -> None:
         context = build_context(r)
         pain = infer_pain_point(r)
         subject = SUBJECT_TMPL.format(company_name=company)
-        body = model_email(first, company, context, pain)
+        prompts.append((first, company, context, pain))
 
         # Smartlead-friendly columns
         rows.append({
@@ -223,7 +279,6 @@ def run(src: str, dst: str, allow_role: bool = False) -> None:
             "website": str(r.get("website") or r.get("url") or ""),
             "phone_primary": str(r.get("phone") or "").split(";")[0],
             "subject": subject,
-            "email_body": body,
             # extras for mapping / debugging
             "domain": domain.loc[_],
             "tier": str(r.get("tier")),
@@ -236,11 +291,24 @@ def run(src: str, dst: str, allow_role: bool = False) -> None:
         "email","first_name","last_name","company","website","phone_primary","subject","email_body",
         "domain","tier","verification_status","contact_quality","signals"
     ]
+    # fail before truncating dst: model_email's SystemExit would otherwise surface
+    # from a worker only after the header was written
+    require_openai()
     os.makedirs(os.path.dirname(dst), exist_ok=True)
-    with open(dst, "w", newline="", encoding="utf-8") as f:
+    with open(dst, "w", newline="", encoding="utf-8") as f, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
         w = csv.DictWriter(f, fieldnames=out_cols)
         w.writeheader()
-        w.writerows(rows)
+        # identical prompts (same contact/company/context) are generated once and broadcast;
+        # model calls are network-bound, so they fan out across threads
+        futures = {a: ex.submit(model_email, *a) for a in dict.fromkeys(prompts)}
+        # write rows in input order as bodies arrive so a crash keeps finished rows
+        # (and the stub cache makes the rerun cheap)
+        for i, (row, a) in enumerate(zip(rows, prompts), 1):
+            row["email_body"] = futures[a].result()
+            w.writerow(row)
+            if i % FLUSH_EVERY == 0:
+                f.flush()
     print(f"[✓] Wrote {len(rows)} Smartlead-ready rows → {dst}")
 
 
@@ -249,9 +317,10 @@ def main():
     ap.add_argument("--in", dest="src", default=DEFAULT_IN)
     ap.add_argument("--out", dest="dst", default=DEFAULT_OUT)
     ap.add_argument("--allow-role", action="store_true", help="Include role emails if named not available")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel model requests")
     args = ap.parse_args()
 
-    run(args.src, args.dst, allow_role=args.allow_role)
+    run(args.src, args.dst, allow_role=args.allow_role, concurrency=args.concurrency)
 
 
 if __name__ == "__main__":
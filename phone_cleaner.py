@@ -4,6 +4,9 @@ from collections import Counter
 import pandas as pd
 
 DIGIT_RE = re.compile(r"[+\d().xXext;,\s-]+")
+NON_DIGIT_RE = re.compile(r"\D")
+HAS_DIGIT_RE = re.compile(r"\d")
+SEPARATOR_RE = re.compile(r"[;,/|]")
 
 # Common junk patterns you showed (placeholders / regex defaults / obvious fakes)
 JUNK_SUBSTRINGS = {
@@ -17,8 +20,15 @@ JUNK_EXACT = {
     "+18888888888", "+19999999999"
 }
 
+def distinct_digits_le(d: str, k: int) -> bool:
+    """True if d uses at most k distinct digits (bitmask popcount, no set allocation)."""
+    mask = 0
+    for c in d:
+        mask |= 1 << (ord(c) - 48)
+    return mask.bit_count() <= k
+
 def only_digits(s: str) -> str:
-    return re.sub(r"\D", "", s or "")
+    return NON_DIGIT_RE.sub("", s or "")
 
 def normalize_us_ca(raw: str):
     """Return (+1XXXXXXXXXX) or None."""
@@ -31,7 +41,7 @@ def normalize_us_ca(raw: str):
     if d[0] in "01" or d[3] in "01":
         return None
     # filter obvious junk (e.g., all same digit)
-    if len(set(d)) <= 2 or d in JUNK_SUBSTRINGS:
+    if distinct_digits_le(d, 2) or d in JUNK_SUBSTRINGS:
         return None
     e164 = f"+1{d}"
     if e164 in JUNK_EXACT:
@@ -48,7 +58,7 @@ def normalize_e164_any(raw: str):
     if not (8 <= len(d) <= 15):
         return None
     # kill sequences of a single digit
-    if len(set(d)) <= 2:
+    if distinct_digits_le(d, 2):
         return None
     return "+" + d
 
@@ -56,11 +66,11 @@ def extract_candidates(cell: str):
     if pd.isna(cell):
         return []
     # Split rudely on common separators, then also scan for digit-y runs
-    parts = re.split(r"[;,/|]", str(cell))
+    parts = SEPARATOR_RE.split(str(cell))
     out = []
     for p in parts:
         # quick reject if it has no digits
-        if not re.search(r"\d", p):
+        if not HAS_DIGIT_RE.search(p):
             continue
         out.append(p.strip())
     return out
@@ -135,9 +145,9 @@ def main():
 
         keep_idx = []
         seen_in_group = {}
-        for idx, row in df.iterrows():
-            key = tuple(row[c] for c in dedupe_cols)
-            phones = [p for p in str(row.get("phone_all", "")).split(";") if p]
+        group_keys = zip(*(df[c] for c in dedupe_cols))
+        for idx, key, phone_all in zip(df.index, group_keys, df["phone_all"]):
+            phones = [p for p in str(phone_all).split(";") if p]
             if not phones:
                 keep_idx.append(idx)
                 continue
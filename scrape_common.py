@@ -0,0 +1,11 @@
+# === Shared page-scraping settings (cg_runner.py, site_profiler.py) ===
+
+# Prefer the lexbor backend (faster C parser); fall back to the modest one on old selectolax
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    from selectolax.parser import HTMLParser
+
+# Stop reading bloated pages after this many bytes. Contact details (often in the
+# footer), titles, headings and JSON-LD all fit well within it.
+MAX_PAGE_BYTES = 1_000_000
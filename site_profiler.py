@@ -1,16 +1,27 @@
 import argparse
 import asyncio
 import csv
-import json
 import re
+import sqlite3
 from collections import Counter, defaultdict
-from urllib.parse import urlparse, urljoin
+from pathlib import Path
+from urllib.parse import urlsplit
 
-import httpx
-from selectolax.parser import HTMLParser
+import aiohttp
+import orjson
+import pandas as pd
+
+from scrape_common import HTMLParser, MAX_PAGE_BYTES
+
+# Optional: single-pass keyword matching via pyahocorasick
+try:
+    import ahocorasick
+except Exception:
+    ahocorasick = None
 
 
 KEY_PAGES = ['/', '/about', '/services', '/contact', '/locations', '/plants', '/ready-mix']
+SITEMAP_LOC_RX = re.compile(r'<loc>\s*(.*?)\s*</loc>', re.I | re.S)
 
 BUSINESS_TYPE_KEYWORDS = {
     'producer_plant': ['batch plant', 'ready mix plant', 'volumetric', 'ready mix', 'batch plant', 'batching plant'],
@@ -25,45 +36,132 @@ SERVICE_KEYWORDS = [
     'plants', 'materials', 'cement', 'asphalt', 'aggregate', 'delivery', 'mixing', 'sand', 'gravel'
 ]
 
+ALL_KEYWORDS = sorted({kw for kws in BUSINESS_TYPE_KEYWORDS.values() for kw in kws} | set(SERVICE_KEYWORDS))
+
+
+def _build_keyword_automaton():
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for kw in ALL_KEYWORDS:
+        automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return automaton
+
+
+# Aho-Corasick reports every keyword occurrence (overlaps included) in one C-level pass
+KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+# Fallback without pyahocorasick: one alternation, longest first, tried at every position via
+# a lookahead. Only the longest keyword per start position is reported, so each hit is
+# expanded to every keyword it contains (e.g. 'ready mix plant' -> 'ready mix').
+KEYWORD_RX = re.compile(
+    '(?=(' + '|'.join(re.escape(kw) for kw in sorted(ALL_KEYWORDS, key=len, reverse=True)) + '))'
+)
+KEYWORD_SUBSUMES = {kw: {other for other in ALL_KEYWORDS if other in kw} for kw in ALL_KEYWORDS}
+
+DEFAULT_HTTP_CACHE = 'data/cache/site_profiler_http.sqlite'
+
 LOCATION_KEYS = ['address', 'addressLocality', 'addressRegion', 'postalCode', 'addressCountry', 'streetAddress']
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Site Profiler for concrete-related businesses")
     parser.add_argument('--in', dest='input_file', required=True, help='Input CSV file')
-    parser.add_argument('--out', dest='output_file', required=True, help='Output CSV file')
+    parser.add_argument('--out', dest='output_file', required=True, help='Output CSV file (.parquet writes Parquet)')
     parser.add_argument('--site-concurrency', type=int, default=3, help='Max concurrent site requests')
     parser.add_argument('--timeout', type=int, default=12, help='HTTP request timeout in seconds')
+    parser.add_argument('--http-cache', default=DEFAULT_HTTP_CACHE,
+                        help='SQLite file for ETag/Last-Modified page cache (empty string disables)')
     return parser.parse_args()
 
 
+class HttpCache:
+    """Tiny url -> (etag, last_modified, body) store so reruns can send conditional GETs."""
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body TEXT)'
+        )
+
+    def get(self, url):
+        return self.conn.execute(
+            'SELECT etag, last_modified, body FROM pages WHERE url = ?', (url,)
+        ).fetchone()
+
+    def put(self, url, etag, last_modified, body):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO pages (url, etag, last_modified, body) VALUES (?, ?, ?, ?)',
+            (url, etag, last_modified, body),
+        )
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
 def normalize_domain(url_or_domain):
+    # plain string ops instead of urlparse: this runs once per input row
     if not url_or_domain:
         return None
-    if not url_or_domain.startswith('http'):
-        url_or_domain = 'http://' + url_or_domain
+    d = url_or_domain.strip().lower()
+    for prefix in ('https://', 'http://'):
+        d = d.removeprefix(prefix)
+    for sep in ('/', '?', '#'):
+        d = d.split(sep, 1)[0]
+    return d or None
+
+
+async def read_capped(resp):
+    """Response body decoded as text, reading at most MAX_PAGE_BYTES."""
+    body = bytearray()
+    async for chunk in resp.content.iter_chunked(64 * 1024):
+        body += chunk
+        if len(body) >= MAX_PAGE_BYTES:
+            break
     try:
-        parsed = urlparse(url_or_domain)
-        if parsed.netloc:
-            return parsed.netloc.lower()
-        return parsed.path.lower()
-    except Exception:
-        return None
-
-
-async def fetch_page(client, base_url, path, timeout):
-    url = urljoin(f'http://{base_url}', path)
+        return body[:MAX_PAGE_BYTES].decode(resp.charset or 'utf-8', errors='replace')
+    except LookupError:
+        return body[:MAX_PAGE_BYTES].decode('utf-8', errors='replace')
+
+
+async def fetch_page(client, base_url, path, timeout, cache=None):
+    # KEY_PAGES all start with '/', so plain concatenation matches urljoin
+    url = f'http://{base_url}{path}'
+    cached = cache.get(url) if cache else None
+    headers = {}
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
     try:
-        resp = await client.get(url, timeout=timeout)
-        if resp.status_code == 200 and resp.text:
-            return resp.text
+        async with client.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            if resp.status == 304 and cached:
+                return cached[2]
+            if resp.status == 200:
+                # PDFs, images and other downloads have nothing to extract; drop them
+                # before reading the body (sitemaps arrive as XML)
+                content_type = resp.headers.get('Content-Type', '').lower()
+                if content_type and 'html' not in content_type and 'xml' not in content_type:
+                    return None
+                text = await read_capped(resp)
+                if text:
+                    if cache:
+                        etag = resp.headers.get('ETag')
+                        last_modified = resp.headers.get('Last-Modified')
+                        if etag or last_modified:
+                            cache.put(url, etag, last_modified, text)
+                    return text
     except Exception:
         pass
     return None
 
 
-def extract_jsonld(html):
-    tree = HTMLParser(html)
+def extract_jsonld(tree):
     scripts = tree.css('script[type="application/ld+json"]')
     data = []
     for s in scripts:
@@ -71,7 +169,7 @@ def extract_jsonld(html):
             text = s.text()
             if not text:
                 continue
-            parsed = json.loads(text)
+            parsed = orjson.loads(text)
             # JSON-LD can be a list or dict
             if isinstance(parsed, list):
                 data.extend(parsed)
@@ -104,22 +202,23 @@ def extract_location_from_jsonld(jsonld_list):
     return None
 
 
-def extract_text_elements(html):
-    tree = HTMLParser(html)
+def extract_text_elements(tree):
+    # raw text; callers lowercase once on the joined blob
     texts = []
     # title
     title = tree.css_first('title')
     if title:
-        texts.append(title.text().lower())
+        texts.append(title.text())
     # meta description
     meta_desc = tree.css_first('meta[name="description"]')
     if meta_desc and meta_desc.attributes.get('content'):
-        texts.append(meta_desc.attributes['content'].lower())
+        texts.append(meta_desc.attributes['content'])
     # h1 and h2
     for tag in ['h1', 'h2']:
         for elem in tree.css(tag):
-            if elem.text():
-                texts.append(elem.text().lower())
+            text = elem.text()
+            if text:
+                texts.append(text)
     return texts
 
 
@@ -132,29 +231,38 @@ def count_keyword_matches(texts, keywords):
     return count
 
 
-def classify_business_type(texts, jsonld_data, pages_fetched):
-    text_blob = ' '.join(texts)
-    text_blob_lower = text_blob.lower()
+def find_keywords(text):
+    """Return the set of known keywords that occur in text, in a single scan when possible."""
+    if KEYWORD_AUTOMATON is not None:
+        return {kw for _, kw in KEYWORD_AUTOMATON.iter(text)}
+    found = set()
+    for kw in set(KEYWORD_RX.findall(text)):
+        found |= KEYWORD_SUBSUMES[kw]
+    return found
+
+
+def classify_business_type(found, jsonld_data, pages_fetched):
+    # `found` is find_keywords() over the lowercased, space-joined page texts
 
     # Check for marketplace first (multiple brands/products)
     marketplace_terms = BUSINESS_TYPE_KEYWORDS['marketplace']
-    marketplace_found = any(term in text_blob_lower for term in marketplace_terms)
+    marketplace_found = any(term in found for term in marketplace_terms)
 
     # Check for producer_plant
     producer_plant_terms = BUSINESS_TYPE_KEYWORDS['producer_plant']
-    producer_plant_found = any(term in text_blob_lower for term in producer_plant_terms)
+    producer_plant_found = any(term in found for term in producer_plant_terms)
 
     # Check for producer_corporate
     producer_corporate_terms = BUSINESS_TYPE_KEYWORDS['producer_corporate']
-    producer_corporate_found = any(term in text_blob_lower for term in producer_corporate_terms)
+    producer_corporate_found = any(term in found for term in producer_corporate_terms)
 
     # Check for contractor
     contractor_terms = BUSINESS_TYPE_KEYWORDS['contractor']
-    contractor_found = any(term in text_blob_lower for term in contractor_terms)
+    contractor_found = any(term in found for term in contractor_terms)
 
     # Check for supplier
     supplier_terms = BUSINESS_TYPE_KEYWORDS['supplier']
-    supplier_found = any(term in text_blob_lower for term in supplier_terms)
+    supplier_found = any(term in found for term in supplier_terms)
 
     # Heuristics:
     if producer_plant_found:
@@ -174,22 +282,17 @@ def classify_business_type(texts, jsonld_data, pages_fetched):
     return 'unknown'
 
 
-def extract_service_keywords(texts):
-    found = set()
-    for text in texts:
-        for kw in SERVICE_KEYWORDS:
-            if kw in text:
-                found.add(kw)
-    return sorted(found)
+def extract_service_keywords(found_per_text):
+    # `found_per_text` only holds keywords matched within a single text element
+    return sorted(kw for kw in SERVICE_KEYWORDS if kw in found_per_text)
 
 
-def calculate_profile_confidence(texts, business_type, service_keywords, location_detected):
+def calculate_profile_confidence(found, business_type, service_keywords, location_detected):
     # Basic heuristic: more keyword hits and location detected => higher confidence
-    text_blob = ' '.join(texts)
     count_keywords = 0
     for kw_list in BUSINESS_TYPE_KEYWORDS.values():
         for kw in kw_list:
-            if kw in text_blob:
+            if kw in found:
                 count_keywords += 1
     count_services = len(service_keywords)
     confidence = 0
@@ -201,13 +304,12 @@ def calculate_profile_confidence(texts, business_type, service_keywords, locatio
     return confidence
 
 
-def extract_signals(texts, jsonld_data):
+def extract_signals(found, jsonld_data):
     signals = []
     # Add business type keywords found
-    text_blob = ' '.join(texts)
     for btype, kws in BUSINESS_TYPE_KEYWORDS.items():
         for kw in kws:
-            if kw in text_blob:
+            if kw in found:
                 signals.append(f'{btype}:{kw}')
     # Add presence of JSON-LD
     if jsonld_data:
@@ -215,24 +317,58 @@ def extract_signals(texts, jsonld_data):
     return ';'.join(signals) if signals else 'none'
 
 
-async def profile_domain(client, domain, timeout):
+def sitemap_key_pages(xml):
+    """KEY_PAGES listed in a sitemap (always keeping '/'), or None if it lists no pages."""
+    paths = set()
+    for loc in SITEMAP_LOC_RX.findall(xml):
+        path = urlsplit(loc).path
+        # a sitemap index only points at more sitemaps; don't trust it to list pages
+        if path.endswith('.xml'):
+            return None
+        paths.add(path.rstrip('/') or '/')
+    if not paths:
+        return None
+    return [path for path in KEY_PAGES if path == '/' or path in paths]
+
+
+async def profile_domain(client, domain, timeout, cache=None):
     pages_fetched = set()
     all_texts = []
     all_jsonld = []
-    for path in KEY_PAGES:
-        html = await fetch_page(client, domain, path, timeout)
-        if html:
+    # most sites 404 on several KEY_PAGES; when a sitemap lists the site's pages,
+    # only request the ones it has
+    sitemap = await fetch_page(client, domain, '/sitemap.xml', timeout, cache)
+    pages = (sitemap and sitemap_key_pages(sitemap)) or KEY_PAGES
+    # key pages are independent GETs to one host: fetch them together, then
+    # consume results in KEY_PAGES order so output stays deterministic
+    htmls = await asyncio.gather(
+        *(fetch_page(client, domain, path, timeout, cache) for path in pages),
+        return_exceptions=True,
+    )
+    # templated sites (and soft-404s redirecting to '/') often serve identical HTML
+    # for several key pages; extract each distinct body only once
+    extracted = {}
+    for path, html in zip(pages, htmls):
+        if isinstance(html, str) and html:
             pages_fetched.add(path)
-            texts = extract_text_elements(html)
+            key = hash(html)
+            if key not in extracted:
+                # parse once per page and share the tree between extractors
+                tree = HTMLParser(html)
+                extracted[key] = (extract_text_elements(tree), extract_jsonld(tree))
+            texts, jsonld = extracted[key]
             all_texts.extend(texts)
-            jsonld = extract_jsonld(html)
             if jsonld:
                 all_jsonld.extend(jsonld)
     location = extract_location_from_jsonld(all_jsonld) or 'unknown'
-    business_type = classify_business_type(all_texts, all_jsonld, pages_fetched)
-    service_keywords = extract_service_keywords(all_texts)
-    profile_confidence = calculate_profile_confidence(all_texts, business_type, service_keywords, location)
-    signals = extract_signals(all_texts, all_jsonld)
+    # one keyword scan over the joined texts; services are matched per element,
+    # so join those with a newline no keyword can span
+    found = find_keywords(' '.join(all_texts).lower())
+    found_per_text = find_keywords('\n'.join(all_texts).lower())
+    business_type = classify_business_type(found, all_jsonld, pages_fetched)
+    service_keywords = extract_service_keywords(found_per_text)
+    profile_confidence = calculate_profile_confidence(found, business_type, service_keywords, location)
+    signals = extract_signals(found, all_jsonld)
 
     return {
         'business_type': business_type,
@@ -262,10 +398,25 @@ async def main():
         else:
             domains.append(None)
 
-    timeout = httpx.Timeout(args.timeout)
-    limits = httpx.Limits(max_keepalive_connections=args.site_concurrency, max_connections=args.site_concurrency)
+    # each in-flight domain fetches all KEY_PAGES at once; keep those connections alive
+    # long enough that the next page on the same host reuses the TCP/TLS session
+    connector = aiohttp.TCPConnector(
+        limit=args.site_concurrency * len(KEY_PAGES),
+        limit_per_host=len(KEY_PAGES),
+        keepalive_timeout=30,
+        enable_cleanup_closed=True,
+        ttl_dns_cache=600,
+    )
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    headers = {
+        'Connection': 'keep-alive',
+        'Accept-Encoding': 'gzip, deflate',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    }
+
+    http_cache = HttpCache(args.http_cache) if args.http_cache else None
 
-    async with httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True) as client:
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as client:
 
         semaphore = asyncio.Semaphore(args.site_concurrency)
 
@@ -280,10 +431,14 @@ async def main():
                     'signals': 'none',
                 }
             async with semaphore:
-                return await profile_domain(client, domain, args.timeout)
+                return await profile_domain(client, domain, args.timeout, http_cache)
 
         tasks = [sem_profile(domain) for domain in domains]
-        results = await asyncio.gather(*tasks)
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            if http_cache:
+                http_cache.close()
 
     # Add profiling columns to rows
     fieldnames = None
@@ -298,12 +453,16 @@ async def main():
         if nf not in fieldnames:
             fieldnames.append(nf)
 
-    with open(args.output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for row, prof in zip(input_rows, results):
-            row.update(prof)
-            writer.writerow(row)
+    for row, prof in zip(input_rows, results):
+        row.update(prof)
+
+    # serialize in one vectorized call rather than row-at-a-time csv writes
+    out_df = pd.DataFrame(input_rows, columns=fieldnames)
+    if args.output_file.endswith('.parquet'):
+        # columnar output for downstream readers that accept it (smaller, faster to reload)
+        out_df.to_parquet(args.output_file, compression='zstd', index=False)
+    else:
+        out_df.to_csv(args.output_file, index=False)
 
     print(f"Profiled {len(domains)} domains -> {args.output_file}")
 
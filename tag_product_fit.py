@@ -15,11 +15,15 @@ Usage example (from repo root, venv active):
         --in  data/outputs/prospects_profiled.csv \
         --out data/outputs/prospects_tagged.csv
 
-The --in file can be prospects_profiled.csv or prospects_enriched.csv.
+The --in file can be prospects_profiled.csv or prospects_enriched.csv (or a
+.parquet equivalent). --out may end in .parquet; the daily snapshot is always
+written as Parquet.
 """
 import argparse
 import re
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 import glob
 import os
@@ -46,11 +50,12 @@ def _find_latest_enriched() -> Path | None:
         return None
     return max(candidates, key=lambda p: p.stat().st_mtime)
 
+# groups are non-capturing: these feed Series.str.contains, which warns on match groups
 READY_MIX_RX = re.compile(
-    r"(ready[\s\-]?mix(?:ed)?|"                 # ready-mix / readymixed
+    r"(?:ready[\s\-]?mix(?:ed)?|"               # ready-mix / readymixed
     r"ready\s?mix\s?concrete|"                 # “ready mix concrete”
     r"redi[\s\-]?mix|"                         # redi-mix
-    r"volumetric|volumetric[\s\-]?(mixer|truck)|"  # volumetric mixer / truck
+    r"volumetric|volumetric[\s\-]?(?:mixer|truck)|"  # volumetric mixer / truck
     r"mobile\s?mix|central[\s\-]?mix|"         # mobile mix, central mix
     r"batch\s?plant|batching\s?plant|concrete\s?plant|"
     r"concrete[\s\-]?delivery(?:\sservice)?|"  # concrete delivery / service
@@ -58,39 +63,97 @@ READY_MIX_RX = re.compile(
     re.I,
 )
 NEGATIVE_RX = re.compile(
-    r"(hardware|garden\scenter|roofing|foundation\srepair|asphalt\s+only|precast|masonry\ssupply)"
+    r"(?:hardware|garden\scenter|roofing|foundation\srepair|asphalt\s+only|precast|masonry\ssupply)"
     r"|(?:homedepot|home\sdepot|lowe'?s|walmart|acehardware|tractor\s?supply)",
     re.I,
 )
-MARKETPLACE_RX = re.compile(r"(yelp|angi|houzz|homeadvisor|thumbtack|facebook\.com)", re.I)
+MARKETPLACE_RX = re.compile(r"(?:yelp|angi|houzz|homeadvisor|thumbtack|facebook\.com)", re.I)
+# negative + marketplace gate fused into one alternation so each blob is scanned once
+REJECT_RX = re.compile(f"{NEGATIVE_RX.pattern}|{MARKETPLACE_RX.pattern}", re.I)
 
 
-def product_fit(row) -> bool:
-    """Return True if this looks like a ready‑mix/producer (plant or corp) or strongly matches producer keywords.
-    Uses site_profiler fields when available; otherwise falls back to regex over text fields.
-    """
-    def g(key: str) -> str:
-        v = row.get(key, "")
-        return "" if v is None else str(v)
+def product_fit_mask(df: pd.DataFrame) -> pd.Series:
+    """product_fit flag for a whole frame: producers (per site_profiler's business_type)
+    pass unless a reject term appears; everyone else needs ready-mix language and no
+    reject term. Regex scans run column-wise in pandas."""
+    def col(key: str) -> pd.Series:
+        if key not in df.columns:
+            return pd.Series("", index=df.index)
+        return df[key].fillna("").astype(str)
+
+    producer = col("business_type").str.lower().isin({"producer_plant", "producer_corporate"})
+    fit = pd.Series(False, index=df.index)
 
     # 1) Strong signal: business_type from site_profiler
-    btype = g("business_type").lower()
-    if btype in {"producer_plant", "producer_corporate"}:
-        blob = " ".join([g("company_name"), g("service_keywords"), g("signals"), g("reason"), g("url"), g("domain")])
-        if NEGATIVE_RX.search(blob) or MARKETPLACE_RX.search(blob):
-            return False
-        return True
-    if btype in {"contractor", "supplier", "marketplace"}:
-        # allow only if we still find strong producer keywords
-        pass
+    blob = col("company_name").str.cat(
+        [col("service_keywords"), col("signals"), col("reason"), col("url"), col("domain")], sep=" "
+    )[producer]
+    # assign raw arrays: a Series would be re-aligned to the full index (NaN-padded)
+    fit[producer] = ~blob.str.contains(REJECT_RX, na=False).to_numpy(dtype=bool)
 
     # 2) Fallback to keyword heuristic across fields
-    txt = " ".join([
-        g("company_name"), g("reason"), g("service_keywords"), g("signals"), g("url"), g("domain"), g("source_url")
-    ])
-    if NEGATIVE_RX.search(txt) or MARKETPLACE_RX.search(txt):
-        return False
-    return bool(READY_MIX_RX.search(txt))
+    txt = col("company_name").str.cat(
+        [col("reason"), col("service_keywords"), col("signals"), col("url"), col("domain"), col("source_url")], sep=" "
+    )[~producer]
+    fit[~producer] = (
+        ~txt.str.contains(REJECT_RX, na=False) & txt.str.contains(READY_MIX_RX, na=False)
+    ).to_numpy(dtype=bool)
+    return fit
+
+
+DROP_RX = re.compile(r"(?:contractor|hardware|repair)", re.I)
+CHUNK_SIZE = 200_000
+
+
+def tag_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Tag product_fit/qualified on one chunk and drop rows we never want to contact."""
+    for col in ["company_name","reason","service_keywords","signals","business_type","url","domain","source_url"]:
+        if col not in df.columns:
+            df[col] = ""
+
+    df["product_fit"] = product_fit_mask(df)
+
+    # sync the “qualified” flag with our improved signal
+    df["qualified"] = df["product_fit"]
+
+    # further remove generic contractors or hardware-only businesses
+    df = df[~df["company_name"].astype(str).str.contains(DROP_RX, na=False)]
+    if "reason" in df.columns:
+        df = df[~df["reason"].fillna("").astype(str).str.contains(DROP_RX)]
+
+    # Optionally hard‑drop Lowe's & Home Depot rows entirely:
+    if "domain" in df.columns:
+        df = df[~df["domain"].astype(str).str.contains(r"(?:homedepot\.com|lowes\.com|walmart\.com)", na=False)]
+    return df
+
+
+def _iter_chunks(src: Path, chunk_size: int):
+    if src.suffix == ".parquet":
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(src).iter_batches(batch_size=chunk_size))
+    else:
+        # dtype=str keeps column types stable across chunks (and ids/zips verbatim)
+        chunks = pd.read_csv(src, chunksize=chunk_size, dtype=str)
+    empty = True
+    for chunk in chunks:
+        empty = False
+        yield chunk
+    if empty:
+        # a zero-row input still yields one (empty) chunk so the outputs get created with headers
+        if src.suffix == ".parquet":
+            yield pq.read_schema(src).empty_table().to_pandas()
+        else:
+            yield pd.read_csv(src, nrows=0, dtype=str)
+
+
+def _write_parquet_chunk(writers: dict, path: Path, df: pd.DataFrame) -> None:
+    """Append df to a Parquet file, opening the writer on first use."""
+    if path not in writers:
+        schema = pa.Table.from_pandas(df, preserve_index=False).schema
+        # an all-empty column in the first chunk infers as null; widen it to string
+        schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+        writers[path] = pq.ParquetWriter(path, schema, compression="zstd")
+    writer = writers[path]
+    writer.write_table(pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False))
 
 
 def main() -> None:
@@ -99,6 +162,8 @@ def main() -> None:
                         help="input CSV path. If omitted, auto-detects latest *_final_leads_enriched.csv")
     parser.add_argument("--out", dest="dst", default=DEFAULT_OUT,
                         help="output CSV path (defaults to final_leads_tagged.csv)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="rows per chunk when streaming the input")
     args = parser.parse_args()
 
     # Auto-detect latest enriched file if --in not provided
@@ -115,38 +180,36 @@ def main() -> None:
     if not src.exists():
         raise SystemExit(f"Input file not found: {src}")
 
-    df = pd.read_csv(src)
-
-    for col in ["company_name","reason","service_keywords","signals","business_type","url","domain","source_url"]:
-        if col not in df.columns:
-            df[col] = ""
-
-    df["product_fit"] = df.apply(product_fit, axis=1)
-
-    # sync the “qualified” flag with our improved signal
-    df["qualified"] = df["product_fit"]
-
-    # further remove generic contractors or hardware-only businesses
-    DROP_RX = re.compile(r"(contractor|hardware|repair)", re.I)
-    df = df[~df["company_name"].astype(str).str.contains(DROP_RX, na=False)]
-    if "reason" in df.columns:
-        df = df[~df["reason"].fillna("").str.contains(DROP_RX)]
-
-    # Optionally hard‑drop Lowe's & Home Depot rows entirely:
-    if "domain" in df.columns:
-        df = df[~df["domain"].str.contains(r"(homedepot\.com|lowes\.com|walmart\.com)", na=False)]
-
-    total = len(df)
-    fit_count = int(df["product_fit"].sum()) if "product_fit" in df.columns else 0
     dst.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(dst, index=False)
+    snapshot = dst.with_stem(f"{dst.stem}_{pd.Timestamp.today():%Y%m%d}").with_suffix(".parquet")
+
+    # stream the input in chunks so peak memory stays bounded on large enriched files.
+    # Write next to dst and swap it in at the end: with --in X --out X the input is
+    # still being read while we write.
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    total = fit_count = 0
+    writers: dict[Path, pq.ParquetWriter] = {}
+    try:
+        try:
+            for i, chunk in enumerate(_iter_chunks(src, args.chunk_size)):
+                df = tag_chunk(chunk)
+                total += len(df)
+                fit_count += int(df["product_fit"].sum())
+                if dst.suffix == ".parquet":
+                    _write_parquet_chunk(writers, tmp, df)
+                else:
+                    df.to_csv(tmp, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+                # keep a daily snapshot for rollback/audit (Parquet: smaller and faster to reload)
+                _write_parquet_chunk(writers, snapshot, df)
+        finally:
+            for w in writers.values():
+                w.close()
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
 
-    # keep a daily snapshot for rollback/audit
-    snapshot = dst.with_stem(f"{dst.stem}_{pd.Timestamp.today():%Y%m%d}")
-    df.to_csv(snapshot, index=False)
     print(f"[✓] product_fit updated → {dst}  (rows: {total}, fit=True: {fit_count})")
     print(f"[✓] snapshot written → {snapshot}")
 
-
 if __name__ == "__main__":
     main()
\ No newline at end of file